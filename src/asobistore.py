@@ -1,60 +1,175 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-import requests
-from dateutil import tz
+import lxml.html
+from lxml import etree
 
+from config import JST
+from http_session import SESSION, has_class, html_parser, response_encoding
 from models import DeadlineEntry
 
 ASOBISTORE_URL: str = (
     "https://shop.asobistore.jp/product/catalog/s/simekiri/n/120/sime/1/cf113/118/p"
 )
+ASOBISTORE_MAX_PAGES: int = 5
 
+# 締切表示（例: あと3日）から日数を取り出すパターン
+_ATO_DAYS = re.compile(r"あと(\d+)日")
 
-def parse_asobistore_items(html: str) -> list[DeadlineEntry]:
+# ページ送りのリンク（例: .../118/p/3）からページ番号を取り出すパターン
+_PAGE_LINK = re.compile(re.escape(urlparse(ASOBISTORE_URL).path) + r"/(\d+)/?(?:[?#]|$)")
+
+
+def _is_pager_link(kind: str, labels: tuple[str, ...]) -> str:
+    """ページ送りの「次へ」「最後へ」などのリンクかを判定する XPath の条件式を返す。
+
+    rel 属性、リンクまたは親要素のクラス、リンクの文言のいずれかで判定する。
+
+    Args:
+        kind (str): rel 属性およびクラス名として使う種別（例: ``next``）。
+        labels (tuple[str, ...]): リンクの文言の候補。
+
+    Returns:
+        str: XPath の条件式。
+    """
+
+    conditions = [f"@rel='{kind}'", has_class(kind), f"parent::*[{has_class(kind)}]"]
+    conditions += [f"normalize-space(.)='{label}'" for label in labels]
+    return " or ".join(conditions)
+
+
+# 解析に使う XPath は読み込み時に一度だけコンパイルする
+_ITEM_BOXES = etree.XPath(f"//div[{has_class('item_box')}]")
+_NAME_LINKS = etree.XPath(
+    f".//*[{has_class('text_area')}]"
+    f"//*[{has_class('name')} and {has_class('product_name_area')}]//a"
+)
+# 「あと◯日」形式の締切マークのみを文書順に返す
+_DEADLINE_MARKS = etree.XPath(
+    f".//*[{has_class('icon')}]//*[{has_class('shimekiri_mark')}]"
+    "[starts-with(normalize-space(.), 'あと') and contains(., '日')]"
+)
+# ページ送り（pager / pagination クラスの要素）の中にあるリンク先のみを返す
+_PAGER = f"//*[{has_class('pager')} or {has_class('pagination')}]"
+_PAGER_HREFS = etree.XPath(f"{_PAGER}//a/@href")
+_PAGER_NEXT_HREFS = etree.XPath(
+    f"{_PAGER}//a[{_is_pager_link('next', ('次へ', '次', '>', '＞', '›'))}]/@href"
+)
+_PAGER_LAST_HREFS = etree.XPath(
+    f"{_PAGER}//a[{_is_pager_link('last', ('最後', '最後へ', '最終', '»'))}]/@href"
+)
+
+
+def parse_html(html: bytes, encoding: str = "utf-8") -> lxml.html.HtmlElement | None:
+    """一覧ページの HTML を解析する。
+
+    Args:
+        html (bytes): 取得した HTML（デコード前のバイト列）。
+        encoding (str, optional): HTML の文字コード。デフォルトは UTF-8。
+
+    Returns:
+        lxml.html.HtmlElement | None: 解析した文書のルート要素。本文が空の場合は ``None``。
+    """
+
+    if not html.strip():
+        return None
+    # バイト列のまま渡し、デコードは lxml の C パーサに任せる
+    return lxml.html.fromstring(html, parser=html_parser(encoding))
+
+
+def parse_asobistore_items(html: bytes, encoding: str = "utf-8") -> list[DeadlineEntry]:
     """アソビストアの HTML から商品情報を抽出する。
 
     Args:
-        html (str): 取得した HTML 文字列。
+        html (bytes): 取得した HTML（デコード前のバイト列）。
+        encoding (str, optional): HTML の文字コード。デフォルトは UTF-8。
+
+    Returns:
+        list[DeadlineEntry]: 抽出した商品エントリのリスト。
+    """
+
+    root = parse_html(html, encoding)
+    return [] if root is None else extract_asobistore_items(root)
+
+
+def extract_asobistore_items(root: lxml.html.HtmlElement) -> list[DeadlineEntry]:
+    """解析済みの一覧ページから商品情報を抽出する。
+
+    Args:
+        root (lxml.html.HtmlElement): 一覧ページのルート要素。
 
     Returns:
         list[DeadlineEntry]: 抽出した商品エントリのリスト。
     """
 
-    soup = BeautifulSoup(html, "html.parser")
     entries: list[DeadlineEntry] = []
     base_url = "https://shop.asobistore.jp"
+    now = datetime.now(tz=JST)
 
-    for item_box in soup.select("div.item_box"):
-        name_tag = item_box.select_one(".text_area .name.product_name_area a")
-        if not name_tag:
+    for item_box in _ITEM_BOXES(root):
+        name_tags = _NAME_LINKS(item_box)
+        if not name_tags:
             continue
-        title = name_tag.get_text(strip=True)
+        name_tag = name_tags[0]
+        title = name_tag.text_content().strip()
         url = name_tag.get("href")
         if url and not url.startswith("http"):
             url = base_url + url
-        deadline_text = None
-        for mark in item_box.select(".icon .shimekiri_mark"):
-            text = mark.get_text(strip=True)
-            if text.startswith("あと") and "日" in text:
-                deadline_text = text
-                break
-        if not deadline_text:
+        marks = _DEADLINE_MARKS(item_box)
+        if not marks:
             continue
-        m = re.search(r"あと(\d+)日", deadline_text)
+        deadline_text = marks[0].text_content().strip()
+        m = _ATO_DAYS.search(deadline_text)
         if m:
             days = int(m.group(1))
         else:
             days = 0
-        jst = tz.gettz("Asia/Tokyo")
-        now = datetime.now(tz=jst)
         deadline = (now + timedelta(days=days)).replace(hour=23, minute=59, second=0, microsecond=0)
         entries.append(DeadlineEntry(title=title, url=url, deadline=deadline))
 
     return entries
 
 
+def _page_numbers(hrefs: list[str]) -> list[int]:
+    """一覧ページへのリンク先からページ番号を取り出す。
+
+    Args:
+        hrefs (list[str]): リンク先の一覧。
+
+    Returns:
+        list[int]: 一覧ページへのリンクのページ番号。
+    """
+
+    return [int(m.group(1)) for href in hrefs if (m := _PAGE_LINK.search(href))]
+
+
+def parse_last_page(root: lxml.html.HtmlElement) -> int | None:
+    """ページ送りのリンクから最終ページの番号を取得する。
+
+    canonical や og:url など、ページ送り以外にある一覧ページへのリンクは見ない。
+    「最後へ」のリンクがあればその番号を使う。無い場合に「次へ」のリンクがあると、
+    表示されている番号より後にもページがあるかもしれない（一部の番号だけを並べる
+    ページ送り）ため、最終ページは不明とする。
+
+    Args:
+        root (lxml.html.HtmlElement): 一覧ページのルート要素。
+
+    Returns:
+        int | None: 最終ページの番号。ページ送りが見つからない場合や、最終ページを
+            判断できない場合は ``None``。
+    """
+
+    last_pages = _page_numbers(_PAGER_LAST_HREFS(root))
+    if last_pages:
+        return max(last_pages)
+    if _page_numbers(_PAGER_NEXT_HREFS(root)):
+        return None
+    pages = _page_numbers(_PAGER_HREFS(root))
+    return max(pages) if pages else None
+
+
 def get_asobistore_items() -> list[DeadlineEntry]:
     """アソビストアから締切間近の商品を取得する。
 
@@ -65,13 +180,45 @@ def get_asobistore_items() -> list[DeadlineEntry]:
         requests.HTTPError: HTTP リクエストに失敗した場合。
     """
 
-    ret = []
-    for i in range(5):
-        response = requests.get(f"{ASOBISTORE_URL}/{i}", timeout=10)
+    def fetch_page(i: int) -> tuple[bytes, str]:
+        """指定したページの HTML を取得する。
+
+        Args:
+            i (int): ページ番号。
+
+        Returns:
+            tuple[bytes, str]: 取得した HTML（デコード前のバイト列）と文字コード。
+        """
+
+        response = SESSION.get(f"{ASOBISTORE_URL}/{i}", timeout=10)
         response.raise_for_status()
-        ret_i = parse_asobistore_items(response.text)
-        if ret_i:
-            ret.extend(ret_i)
-        else:
-            break
+        return response.content, response_encoding(response)
+
+    first, encoding = fetch_page(0)
+    root = parse_html(first, encoding)
+    if root is None:
+        return []
+    ret = extract_asobistore_items(root)
+    if not ret:
+        return ret
+
+    # ページ送りから存在するページ数がわかれば、その分だけ取得する
+    last_page = parse_last_page(root)
+    num_pages = ASOBISTORE_MAX_PAGES if last_page is None else min(last_page + 1, ASOBISTORE_MAX_PAGES)
+
+    # 残りのページを同時に取得し、先頭から順に空ページが現れるまで連結する。
+    # 結果は空ページより前のものだけを受け取るので、それ以降のページの失敗は無視される
+    executor = ThreadPoolExecutor(max_workers=ASOBISTORE_MAX_PAGES)
+    try:
+        futures = [executor.submit(fetch_page, i) for i in range(1, num_pages)]
+        for future in futures:
+            html, encoding = future.result()
+            ret_i = parse_asobistore_items(html, encoding)
+            if ret_i:
+                ret.extend(ret_i)
+            else:
+                break
+    finally:
+        # 空ページ以降の取得は待たずに打ち切る
+        executor.shutdown(wait=False, cancel_futures=True)
     return ret
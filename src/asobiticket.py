@@ -1,26 +1,90 @@
 # scrape_clickthrough.py
+import atexit
 import re
-import time, tempfile
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass
-from urllib.parse import urlparse
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from typing import Iterator
+from urllib.parse import urljoin, urlparse
+
+import lxml.html
+import requests
+from lxml import etree
+
+from config import JST, use_selenium
+from http_session import SESSION, USER_AGENT, has_class, html_parser, response_encoding
 
 BASE = "https://asobiticket2.asobistore.jp"
 LIST_URL = f"{BASE}/booths"
 
+# 受付期間のパターン（例: 2025年7月31日(木) 15:00 〜 2025年8月3日(日) 9:59）。
+# 日時は半角数字で表示されるため、数字は [0-9] で ASCII の数字だけに一致させる。
+# 曜日と時刻の間や 〜 の前後には &nbsp;・全角スペース・改行が入ることがあるので、
+# 区切りは Unicode の \s で受ける。
+# 年・月・日・時・分をそれぞれグループで取り出し、曜日部分（(木)など）は読み飛ばす
+_DATETIME = r"([0-9]{4})年([0-9]{1,2})月([0-9]{1,2})日\([^)]+\)\s*([0-9]{1,2}):([0-9]{2})"
+_KIKAN = re.compile(_DATETIME + r"\s*〜\s*" + _DATETIME)
+
+# 一覧ページの解析に使う XPath は読み込み時に一度だけコンパイルする
+_BOOTH_CARDS = etree.XPath(f"//div[{has_class('booth-item')}]")
+_BOOTH_HREFS = etree.XPath("@href | ancestor::a[1]/@href | .//a/@href")
+_BOOTH_TITLES = etree.XPath(f".//*[{has_class('booth-title')}]")
+
+# 一覧の全カードからテキスト・タイトル・リンクをまとめて取り出すスクリプト
+_CARDS_INFO_SCRIPT = """
+return [...document.querySelectorAll("div.booth-item[tpl-tappable]")].map((card) => {
+    const title = card.querySelector(".booth-title");
+    const link = card.closest("a") || card.querySelector("a");
+    return {
+        text: card.innerText.trim(),
+        title: title ? title.innerText.trim() : "",
+        href: link ? link.href : "",
+    };
+});
+"""
+
+# Selenium で読み込まないリソースの URL パターン
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.css",
+]
+
+# HTTP で詳細ページを同時に取得する数の上限
+MAX_DETAIL_WORKERS = 8
+
+# 詳細ページを同時に開くタブ数の上限
+MAX_TABS = 4
+
+# Selenium で詳細ページの受付期間が描画されるのを待つ最大秒数
+DETAIL_RENDER_TIMEOUT = 10
+
+_DRIVER = None
+_DRIVER_LOCK = threading.Lock()
+
 
 def make_driver():
     """Selenium 用の Chrome WebDriver を生成する。
 
+    selenium の import は重いため、モジュールの先頭ではなく、フォールバックで
+    WebDriver を使うこの関数などの中で行う。
+
     Returns:
         webdriver.Chrome: 構成済みの WebDriver インスタンス。
     """
 
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
     tmp = tempfile.mkdtemp(prefix="selenium-prof-")
     o = Options()
     o.add_argument("--headless=new")  # ダメなら "--headless" に
@@ -30,11 +94,28 @@ def make_driver():
     o.add_argument(f"--user-data-dir={tmp}")
     o.add_argument("--remote-debugging-port=0")
     o.add_argument("--lang=ja-JP")
-    o.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
-    )
-    return webdriver.Chrome(options=o)
+    o.add_argument(f"--user-agent={USER_AGENT}")
+    # DOMContentLoaded で get() から戻り、以降の待機はカード要素の出現で判断する
+    o.page_load_strategy = "eager"
+    # テキストしか読まないので画像は読み込まない
+    o.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    driver = webdriver.Chrome(options=o)
+    block_resources(driver)
+    return driver
+
+
+def block_resources(driver):
+    """現在のタブで画像・フォント・CSS のリクエストをブロックする。
+
+    CDP の設定はタブごとに効くため、新しく開いたタブでも読み込み前に呼び出す。
+    一覧の描画に必要な JS は残す。
+
+    Args:
+        driver (webdriver.Chrome): 操作対象の WebDriver。
+    """
+
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCE_PATTERNS})
 
 
 def accept_cookie(driver):
@@ -44,6 +125,11 @@ def accept_cookie(driver):
         driver (webdriver.Chrome): 操作対象の WebDriver。
     """
 
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     for xp in [
         "//button[normalize-space()='Accept All Cookies']",
         "//button[contains(., 'Accept All Cookies')]",
@@ -54,10 +140,14 @@ def accept_cookie(driver):
                 EC.element_to_be_clickable((By.XPATH, xp))
             )
             btn.click()
-            time.sleep(0.4)
-            break
         except Exception:
+            continue
+        # バナーが消えるまで待つ（消えなくても先に進む）
+        try:
+            WebDriverWait(driver, 2).until(EC.invisibility_of_element(btn))
+        except TimeoutException:
             pass
+        break
 
 
 def wait_list_ready(driver):
@@ -67,10 +157,14 @@ def wait_list_ready(driver):
         driver (webdriver.Chrome): 操作対象の WebDriver。
     """
 
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     WebDriverWait(driver, 30).until(
-        lambda d: d.execute_script("return document.readyState") == "complete"
+        lambda d: d.execute_script("return document.readyState") != "loading"
     )
-    # カード要素が並ぶまで待つ
+    # カード要素が並ぶまで待つ（読み込み完了の判定はこちらを正とする）
     WebDriverWait(driver, 25).until(
         EC.presence_of_all_elements_located(
             (By.CSS_SELECTOR, "div.booth-item[tpl-tappable]")
@@ -84,17 +178,48 @@ def grow_list_by_scrolling(driver, max_scroll=6, pause=0.8):
     Args:
         driver (webdriver.Chrome): 操作対象の WebDriver。
         max_scroll (int, optional): 最大スクロール回数。デフォルトは 6。
-        pause (float, optional): スクロール間の待機秒数。デフォルトは 0.8 秒。
+        pause (float, optional): カードの増加を待つ最大秒数。デフォルトは 0.8 秒。
     """
 
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    def count_cards(d):
+        """表示中のカード数を返す。"""
+
+        return len(d.find_elements(By.CSS_SELECTOR, "div.booth-item[tpl-tappable]"))
+
     last = 0
     for _ in range(max_scroll):
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(pause)
-        n = len(driver.find_elements(By.CSS_SELECTOR, "div.booth-item[tpl-tappable]"))
-        if n == last:
+        # カードが増えた時点で次へ進み、増えなければ打ち切る
+        try:
+            WebDriverWait(driver, pause).until(lambda d: count_cards(d) > last)
+        except TimeoutException:
             break
-        last = n
+        last = count_cards(driver)
+
+
+def parse_uketsuke_kikan_list(text: str) -> list[tuple[datetime, datetime]]:
+    """テキストから受付期間を抽出する。
+
+    Args:
+        text (str): 詳細ページ全体のテキスト。
+
+    Returns:
+        list[tuple[datetime, datetime]]: 受付開始・終了日時のタプル一覧。
+    """
+
+    periods = []
+    for m in _KIKAN.finditer(text):
+        # strptime を使わず、取り出した数値から日本時間の datetime を直接組み立てる
+        nums = [int(n) for n in m.groups()]
+        start_dt = datetime(*nums[:5], tzinfo=JST)
+        end_dt = datetime(*nums[5:], tzinfo=JST)
+        periods.append((start_dt, end_dt))
+
+    return periods
 
 
 def get_uketsuke_kikan_list(d):
@@ -107,28 +232,39 @@ def get_uketsuke_kikan_list(d):
         list[tuple[datetime, datetime]]: 受付開始・終了日時のタプル一覧。
     """
 
-    # ページ全体のテキスト
-    text = d.find_element(By.TAG_NAME, "body").text
+    # ページ全体のテキスト（要素経由の .text より往復が少ない）
+    text = d.execute_script("return document.body.innerText || document.body.textContent")
+    return parse_uketsuke_kikan_list(text)
 
-    # 正規表現パターン（例: 2025年7月31日(木) 15:00 〜 2025年8月3日(日) 9:59）
-    pattern = (
-        r"(\d{4}年\d{1,2}月\d{1,2}日\([^)]+\) \d{1,2}:\d{2})"
-        r"\s*〜\s*"
-        r"(\d{4}年\d{1,2}月\d{1,2}日\([^)]+\) \d{1,2}:\d{2})"
-    )
 
-    matches = re.findall(pattern, text)
-    periods = []
-    for start_str, end_str in matches:
-        # 曜日部分（(木)など）を削除
-        start_clean = re.sub(r"\([^)]*\)", "", start_str).strip()
-        end_clean = re.sub(r"\([^)]*\)", "", end_str).strip()
-        # datetime に変換
-        start_dt = datetime.strptime(start_clean, "%Y年%m月%d日 %H:%M")
-        end_dt = datetime.strptime(end_clean, "%Y年%m月%d日 %H:%M")
-        periods.append((start_dt, end_dt))
+def parse_booth_list(html: bytes, encoding: str = "utf-8") -> Iterator[tuple[str, str]]:
+    """イベント一覧の HTML からタイトルと詳細ページ URL を抽出する。
 
-    return periods
+    Args:
+        html (bytes): 一覧ページの HTML（デコード前のバイト列）。
+        encoding (str, optional): HTML の文字コード。デフォルトは UTF-8。
+
+    Yields:
+        tuple[str, str]: ``(タイトル, 詳細 URL)`` のタプル。見つかった順に返す。
+    """
+
+    if not html.strip():
+        return
+    root = lxml.html.fromstring(html, parser=html_parser(encoding))
+    seen: set[str] = set()
+    for card in _BOOTH_CARDS(root):
+        # カード自身か、カードを囲む/カード内のリンクから遷移先を得る
+        hrefs = _BOOTH_HREFS(card)
+        if not hrefs:
+            continue
+        url = urljoin(BASE, hrefs[0])
+        # /booths/ を含む詳細遷移のみ採用
+        if "/booths/" not in urlparse(url).path or url in seen:
+            continue
+        seen.add(url)
+        titles = _BOOTH_TITLES(card)
+        title = titles[0].text_content().strip() if titles else ""
+        yield title, url
 
 @dataclass
 class AsobiticketData:
@@ -145,72 +281,253 @@ class AsobiticketData:
     uketsuke_kikan_list: list[tuple[datetime, datetime]]
 
 
-def fetch_asobiticket() -> list[AsobiticketData]:
-    """アソビチケットのイベント一覧をスクレイピングする。
+def fetch_asobiticket_http() -> list[AsobiticketData]:
+    """ブラウザを使わずに HTTP でアソビチケットのイベント一覧を取得する。
+
+    Returns:
+        list[AsobiticketData]: 取得したイベントデータのリスト。
+
+    Raises:
+        requests.HTTPError: 一覧ページの取得に失敗した場合。詳細ページの取得に
+            失敗したイベントはログを出して読み飛ばす。
+    """
+
+    response = SESSION.get(LIST_URL, timeout=10)
+    response.raise_for_status()
+
+    def fetch_detail(index: int, title: str, url: str) -> tuple[bytes, str] | None:
+        """詳細ページの HTML を取得する。
+
+        Args:
+            index (int): 一覧内の位置。
+            title (str): イベントタイトル。
+            url (str): 詳細ページの URL。
+
+        Returns:
+            tuple[bytes, str] | None: 取得した HTML（デコード前のバイト列）と文字コード。
+                取得に失敗した場合は ``None``。
+        """
+
+        print(f"Processing booth {index + 1}, {title}")
+        # 1 件の失敗で全体を止めず、そのイベントだけ読み飛ばす
+        try:
+            response = SESSION.get(url, timeout=10)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Error fetching booth {index + 1}: {e}")
+            return None
+        return response.content, response_encoding(response)
+
+    # 一覧からリンクを取り出したそばから詳細ページを同時に取得する。
+    # パーサはスレッド間で共有できないため、解析は結果を受け取る側で一覧の順に行う
+    with ThreadPoolExecutor(max_workers=MAX_DETAIL_WORKERS) as executor:
+        jobs = [
+            (title, url, executor.submit(fetch_detail, i, title, url))
+            for i, (title, url) in enumerate(
+                parse_booth_list(response.content, response_encoding(response))
+            )
+        ]
+        results: list[AsobiticketData] = []
+        for title, url, future in jobs:
+            page = future.result()
+            if page is None:
+                continue
+            html, encoding = page
+            text = (
+                lxml.html.fromstring(html, parser=html_parser(encoding)).text_content()
+                if html.strip()
+                else ""
+            )
+            results.append(
+                AsobiticketData(
+                    title=title,
+                    url=url,
+                    uketsuke_kikan_list=parse_uketsuke_kikan_list(text),
+                )
+            )
+        return results
+
+
+def _get_driver():
+    """共有の WebDriver を取得する。初回呼び出し時にのみ生成する。
+
+    Returns:
+        webdriver.Chrome: 使い回す WebDriver インスタンス。
+    """
+
+    global _DRIVER
+    with _DRIVER_LOCK:
+        if _DRIVER is None:
+            _DRIVER = make_driver()
+            atexit.register(_quit_driver)
+        return _DRIVER
+
+
+def _quit_driver():
+    """共有の WebDriver を終了する。"""
+
+    global _DRIVER
+    with _DRIVER_LOCK:
+        if _DRIVER is not None:
+            _DRIVER.quit()
+            _DRIVER = None
+
+
+def _discard_driver():
+    """応答しなくなった共有の WebDriver を破棄し、次回の呼び出しで作り直させる。"""
+
+    global _DRIVER
+    with _DRIVER_LOCK:
+        driver, _DRIVER = _DRIVER, None
+    if driver is not None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+def _click_through(d, index):
+    """カードをクリックして遷移先の URL を取得し、一覧に戻る。
+
+    リンクを持たないカード用のフォールバック。
+
+    Args:
+        d (webdriver.Chrome): 操作対象の WebDriver。
+        index (int): 一覧内のカードの位置。
+
+    Returns:
+        str | None: 遷移先の URL。クリックに失敗した場合は ``None``。
+    """
+
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # クリック対象を都度取り直す（戻った時にDOMが再構築される想定）
+    card = d.find_elements(By.CSS_SELECTOR, "div.booth-item[tpl-tappable]")[index]
+    # クリック → URL変化を待つ
+    before = d.current_url
+    try:
+        card.click()
+        WebDriverWait(d, 10).until(lambda drv: drv.current_url != before)
+    except Exception as e:
+        print(f"Error clicking card {index + 1}: {e}")
+        return None
+    url = d.current_url
+
+    # 戻って次へ
+    d.back()
+    wait_list_ready(d)
+    return url
+
+
+def fetch_asobiticket_selenium() -> list[AsobiticketData]:
+    """Selenium でアソビチケットのイベント一覧をスクレイピングする。
+
+    WebDriver は呼び出し間で使い回し、詳細ページは最大 ``MAX_TABS`` 個の
+    タブで同時に読み込む。
 
     Returns:
         list[AsobiticketData]: 取得したイベントデータのリスト。
     """
 
-    d = make_driver()
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    d = _get_driver()
     results: list[AsobiticketData] = []
+    list_handle = d.current_window_handle
     try:
         d.get(LIST_URL)
         accept_cookie(d)
         wait_list_ready(d)
         grow_list_by_scrolling(d)
 
-        # カード要素を取得
-        num_cards = len(d.find_elements(By.CSS_SELECTOR, "div.booth-item[tpl-tappable]"))
-        # クリック対象を都度取り直す（戻った時にDOMが再構築される想定）
-        for i in range(num_cards):
-            # クリック対象のカードを取得
-            cards = d.find_elements(By.CSS_SELECTOR, "div.booth-item[tpl-tappable]")
-            card = cards[i]
-            print(f"Processing card {i + 1}/{len(cards)}, {card.text.strip()}")
-            # タイトル/サムネ（見えなければ空でOK）
-            try:
-                title = card.find_element(By.CSS_SELECTOR, ".booth-title").text.strip()
-            except Exception:
-                title = ""
-            try:
-                thumb = (
-                    card.find_element(By.CSS_SELECTOR, "img").get_attribute("src")
-                    or ""
-                )
-            except Exception:
-                thumb = ""
-
-            # クリック → URL変化を待つ
-            before = d.current_url
-            try:
-                card.click()
-                time.sleep(2.0)  # 少し待つ
-            except Exception as e:
-                print(f"Error clicking card {i + 1}: {e}")
-                continue
-
-            url = d.current_url
+        # 全カードの情報を 1 回のスクリプト実行で取得し、遷移先 URL を先にまとめて集める
+        targets: list[tuple[str, str]] = []
+        cards = d.execute_script(_CARDS_INFO_SCRIPT)
+        for i, info in enumerate(cards):
+            print(f"Processing card {i + 1}/{len(cards)}, {info['text']}")
+            # タイトル（見えなければ空でOK）
+            title = info["title"]
+            url = info["href"]
+            if not url:
+                url = _click_through(d, i)
             # /booths/ を含む詳細遷移のみ採用
-            if "/booths/" in urlparse(url).path:
+            if url and "/booths/" in urlparse(url).path:
+                targets.append((title, url))
+
+        # 詳細ページをタブで同時に開き、順に読み取って閉じる
+        for start in range(0, len(targets), MAX_TABS):
+            batch = targets[start : start + MAX_TABS]
+            handles = []
+            for _, url in batch:
+                # 空のタブを開いてブロック設定をしてから遷移させる。
+                # 遷移は待たずに次のタブを開き、読み込みを並行させる
+                before = set(d.window_handles)
+                d.execute_script("window.open('about:blank');")
+                handle = (set(d.window_handles) - before).pop()
+                d.switch_to.window(handle)
+                block_resources(d)
+                d.execute_script("location.href = arguments[0];", url)
+                handles.append(handle)
+            for (title, url), handle in zip(batch, handles):
+                d.switch_to.window(handle)
+                WebDriverWait(d, 30).until(
+                    lambda drv: drv.current_url != "about:blank"
+                    and drv.execute_script("return document.readyState") == "complete"
+                )
+                # JS で描画されるページは読み込み完了の時点では本文が空のことがあるため、
+                # 受付期間が読み取れるまで待つ（現れなければ受付期間なしとして扱う）
+                try:
+                    periods = WebDriverWait(d, DETAIL_RENDER_TIMEOUT).until(get_uketsuke_kikan_list)
+                except TimeoutException:
+                    print(f"No reception period found on {url}")
+                    periods = []
                 results.append(
                     AsobiticketData(
                         title=title,
                         url=url,
-                        uketsuke_kikan_list=get_uketsuke_kikan_list(d),
+                        uketsuke_kikan_list=periods,
                     )
                 )
-
-            # 戻って次へ
-            d.back()
-            wait_list_ready(d)
-            # スクロールを戻す（再計算のため軽く待つ）
-            time.sleep(0.3)
+                d.close()
+            d.switch_to.window(list_handle)
 
     finally:
-        d.quit()
+        # 途中で失敗した場合も開いたタブを閉じて次回に備える。
+        # WebDriver が落ちている場合は元の例外を隠さないよう、破棄して作り直させる
+        try:
+            for handle in d.window_handles:
+                if handle != list_handle:
+                    d.switch_to.window(handle)
+                    d.close()
+            d.switch_to.window(list_handle)
+        except Exception as e:
+            print(f"Error cleaning up WebDriver tabs: {e}")
+            _discard_driver()
 
     return results
+
+
+def fetch_asobiticket() -> list[AsobiticketData]:
+    """アソビチケットのイベント一覧を取得する。
+
+    通常は HTTP で取得し、``--SELENIUM`` 指定時または一覧からカードを
+    取得できなかった場合（JavaScript で描画されている場合）は Selenium に
+    フォールバックする。
+
+    Returns:
+        list[AsobiticketData]: 取得したイベントデータのリスト。
+    """
+
+    if not use_selenium():
+        results = fetch_asobiticket_http()
+        if results:
+            return results
+        print("No booths found via HTTP, falling back to Selenium")
+    return fetch_asobiticket_selenium()
+
+
 if __name__ == "__main__":
     data = fetch_asobiticket()
     print(f"Found {len(data)} items")
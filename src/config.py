@@ -1,6 +1,15 @@
 import os
 import sys
 
+from dateutil import tz
+
+# 締切の判定に使うタイムゾーン（日本時間）。一度だけ生成して各モジュールで共有する
+JST = tz.gettz("Asia/Tokyo")
+
+# sys.argv は実行中に変わらないため、起動時に一度だけ判定する
+_IS_DEBUG: bool = "--DEBUG" in sys.argv
+_USE_SELENIUM: bool = "--SELENIUM" in sys.argv
+
 
 def is_debug() -> bool:
     """デバッグ環境かどうかを判定する。
@@ -9,7 +18,17 @@ def is_debug() -> bool:
         bool: コマンドライン引数に ``--DEBUG`` が含まれている場合は ``True``。
     """
 
-    return "--DEBUG" in sys.argv
+    return _IS_DEBUG
+
+
+def use_selenium() -> bool:
+    """アソビチケットの取得に Selenium を使うかどうかを判定する。
+
+    Returns:
+        bool: コマンドライン引数に ``--SELENIUM`` が含まれている場合は ``True``。
+    """
+
+    return _USE_SELENIUM
 
 
 def load_alert_days() -> list[int]:
@@ -1,11 +1,85 @@
-import requests
+import json
+import time
 
 from config import is_debug
+from http_session import SESSION
+
+# レート制限（HTTP 429）時に再送する最大回数
+MAX_RATE_LIMIT_RETRIES: int = 3
+
+# 1 メッセージあたりの最大文字数
+DISCORD_MESSAGE_LIMIT: int = 2000
+# 分割したメッセージを続けて送る際の間隔（秒）
+CHUNK_INTERVAL: float = 0.25
+
+_JSON_HEADERS: dict[str, str] = {"Content-Type": "application/json"}
+
+
+def _chunk_message(msg: str, limit: int = DISCORD_MESSAGE_LIMIT) -> list[str]:
+    """メッセージを上限文字数以下のチャンクに分割する。
+
+    なるべく改行の位置で分割し、1 行だけで上限を超える場合はその行を
+    上限文字数ごとに区切る。空白だけのチャンクは送信できないため含めない。
+
+    Args:
+        msg (str): 分割するメッセージ。
+        limit (int, optional): 1 チャンクあたりの最大文字数。デフォルトは 2000。
+
+    Returns:
+        list[str]: 分割したメッセージのリスト。
+    """
+
+    if len(msg) <= limit:
+        return [msg] if msg.strip() else []
+    chunks: list[str] = []
+    # 空行も 1 行として扱うため、「チャンクなし」は空文字列ではなく None で表す
+    current: str | None = None
+    for line in msg.split("\n"):
+        while len(line) > limit:
+            if current is not None:
+                chunks.append(current)
+                current = None
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current is None:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            chunks.append(current)
+            current = line
+    if current is not None:
+        chunks.append(current)
+    # Discord は空白だけの本文を受け付けないため、そのようなチャンクは送らない
+    return [chunk for chunk in chunks if chunk.strip()]
 
 
 def send_discord(webhook_url: str, content: str) -> None:
     """Webhook を使って Discord にメッセージを送信する。
 
+    本文が Discord の上限文字数を超える場合は改行位置で分割し、
+    ``CHUNK_INTERVAL`` 秒ずつ間隔を空けて順に送信する。
+
+    Args:
+        webhook_url (str): Discord の Webhook URL。
+        content (str): 送信するメッセージ本文。
+
+    Raises:
+        RuntimeError: 送信が HTTP ステータス 204 以外で失敗した場合。
+    """
+
+    for i, chunk in enumerate(_chunk_message(content)):
+        if i and not is_debug():
+            time.sleep(CHUNK_INTERVAL)
+        _post_message(webhook_url, chunk)
+
+
+def _post_message(webhook_url: str, content: str) -> None:
+    """Webhook に 1 件のメッセージを送信する。
+
+    レート制限に達した場合は ``Retry-After`` の秒数だけ待って再送し、
+    残り回数が 0 になった場合は次の送信に備えてリセットまで待つ。
+
     Args:
         webhook_url (str): Discord の Webhook URL。
         content (str): 送信するメッセージ本文。
@@ -17,7 +91,18 @@ def send_discord(webhook_url: str, content: str) -> None:
     if is_debug():
         print(f"DEBUG: Sending to {webhook_url} with content:\n{content}")
         return
-    ret = requests.post(webhook_url, json={"content": content}, timeout=10)
+    # 本文は一度だけ UTF-8 の JSON にし、再送時も同じバイト列を送る
+    body = json.dumps({"content": content}, ensure_ascii=False, separators=(",", ":")).encode()
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        ret = SESSION.post(webhook_url, data=body, headers=_JSON_HEADERS, timeout=10)
+        if ret.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+            break
+        retry_after = float(ret.headers.get("Retry-After", 1))
+        print(f"Rate limited by Discord, retrying after {retry_after}s")
+        time.sleep(retry_after)
     if ret.status_code != 204:
         print(f"Failed to send Discord message: {ret.status_code} {ret.text}")
         raise RuntimeError(f"Discord webhook failed with status {ret.status_code}")
+    # 残り回数を使い切った場合は、次の送信が 429 にならないようリセットまで待つ
+    if ret.headers.get("X-RateLimit-Remaining") == "0":
+        time.sleep(float(ret.headers.get("X-RateLimit-Reset-After", 0)))
@@ -0,0 +1,93 @@
+"""各モジュールで共有する HTTP セッション・HTML パーサと XPath の補助関数。"""
+
+from functools import lru_cache
+
+import lxml.html
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+USER_AGENT: str = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# urllib3 が展開できる圧縮形式のみを受け付ける（brotli 等が入っていれば br も含む）
+ACCEPT_ENCODING: str = make_headers(accept_encoding=True)["accept-encoding"]
+
+
+def make_session() -> requests.Session:
+    """接続を使い回す requests のセッションを生成する。
+
+    Returns:
+        requests.Session: コネクションプールとリトライを設定したセッション。
+    """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # リトライを使い切った場合は最後のレスポンスを返し、呼び出し側で判定する
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+    return session
+
+
+SESSION: requests.Session = make_session()
+
+
+def response_encoding(response: requests.Response) -> str:
+    """レスポンス本文の文字コードを返す。
+
+    Content-Type に charset の指定がない場合は、requests の既定の ISO-8859-1 ではなく
+    UTF-8 とみなす。
+
+    Args:
+        response (requests.Response): 対象のレスポンス。
+
+    Returns:
+        str: 文字コード名。
+    """
+
+    if "charset=" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        return response.encoding
+    return "utf-8"
+
+
+@lru_cache(maxsize=None)
+def html_parser(encoding: str = "utf-8") -> lxml.html.HTMLParser:
+    """文字コードごとに使い回す lxml の HTML パーサを返す。
+
+    壊れた HTML も読み込み、巨大な木は許可しない。パーサはスレッド間で共有できないため、
+    解析は呼び出し元のスレッドでまとめて行う。
+
+    Args:
+        encoding (str, optional): バイト列の文字コード。デフォルトは UTF-8。
+
+    Returns:
+        lxml.html.HTMLParser: HTML パーサ。
+    """
+
+    return lxml.html.HTMLParser(encoding=encoding, recover=True, huge_tree=False)
+
+
+def has_class(name: str) -> str:
+    """class 属性に指定したクラスを含むかを判定する XPath の条件式を返す。
+
+    Args:
+        name (str): クラス名。
+
+    Returns:
+        str: XPath の条件式。
+    """
+
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
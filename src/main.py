@@ -1,13 +1,13 @@
 """アソビストアとアソビチケットの締切通知のメインエントリーポイント。"""
 
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import os
 
-from dateutil import tz
-
-from config import load_alert_days
+from config import JST, load_alert_days
 from discord_client import send_discord
+from http_session import SESSION
 from asobistore import get_asobistore_items, ASOBISTORE_URL
 from ticket import get_ticket_events, ASOBITICKET_EVENTS_URL
 from notifications import filter_entries, format_message
@@ -26,9 +26,24 @@ def main() -> None:
         raise RuntimeError("DISCORD_WEBHOOK_URL is not set")
 
     alert_days: list[int] = load_alert_days()
+    # 判定用の集合は一度だけ作り、各 filter_entries で使い回す
+    alert_set = frozenset(alert_days)
+
+    now = datetime.now(tz=JST)
+
+    # 送信はバックグラウンドで行い、その間に次の取得や整形を進める。
+    # メッセージの順序を保つため、送信ワーカーは 1 つにする
+    sender = ThreadPoolExecutor(max_workers=1)
+    pending: list[Future[None]] = []
 
-    jst = tz.gettz("Asia/Tokyo")
-    now = datetime.now(tz=jst)
+    def post(content: str) -> None:
+        """メッセージの送信を予約する。
+
+        Args:
+            content (str): 送信するメッセージ本文。
+        """
+
+        pending.append(sender.submit(send_discord, webhook_url, content))
 
     def send_entries_by_deadline(
         section: str, entries: list[DeadlineEntry], omitted_message: str
@@ -43,7 +58,7 @@ def main() -> None:
 
         by_deadline = defaultdict(list)
         for e in entries:
-            by_deadline[e.deadline.date()].append(e)
+            by_deadline[e.deadline_date].append(e)
         for deadline in sorted(by_deadline.keys()):
             group = by_deadline[deadline]
             msg = format_message(
@@ -51,39 +66,46 @@ def main() -> None:
                 group,
                 omitted_message=omitted_message,
             )
-            send_discord(webhook_url, msg)
-
-    any_sent = False
+            post(msg)
 
     try:
-        store_items = filter_entries(get_asobistore_items(), alert_days, now)
-        if store_items:
-            send_entries_by_deadline(
-                "アソビストア 締切間近",
-                store_items,
-                omitted_message=f"...一部省略されています...\n詳細は[アソビストア]({ASOBISTORE_URL})を確認してください。",
-            )
+        any_sent = False
+
+        try:
+            store_items = filter_entries(get_asobistore_items(), alert_set, now)
+            if store_items:
+                send_entries_by_deadline(
+                    "アソビストア 締切間近",
+                    store_items,
+                    omitted_message=f"...一部省略されています...\n詳細は[アソビストア]({ASOBISTORE_URL})を確認してください。",
+                )
+                any_sent = True
+        except NotImplementedError:
+            post("アソビストアのパースは未実装です。")
             any_sent = True
-    except NotImplementedError:
-        send_discord(webhook_url, "アソビストアのパースは未実装です。")
-        any_sent = True
 
-    try:
-        ticket_items = filter_entries(get_ticket_events(), alert_days, now)
-        if ticket_items:
-            send_entries_by_deadline(
-                "アソビチケット 締切間近",
-                ticket_items,
-                omitted_message=f"...一部省略されています...\n詳細は[アソビチケット]({ASOBITICKET_EVENTS_URL})を確認してください。",
-            )
+        try:
+            ticket_items = filter_entries(get_ticket_events(), alert_set, now)
+            if ticket_items:
+                send_entries_by_deadline(
+                    "アソビチケット 締切間近",
+                    ticket_items,
+                    omitted_message=f"...一部省略されています...\n詳細は[アソビチケット]({ASOBITICKET_EVENTS_URL})を確認してください。",
+                )
+                any_sent = True
+        except NotImplementedError:
+            post("アソビチケットのパースは未実装です。")
             any_sent = True
-    except NotImplementedError:
-        send_discord(webhook_url, "アソビチケットのパースは未実装です。")
-        any_sent = True
 
-    if not any_sent:
-        no_message = ",".join(map(str, sorted(alert_days))) + "日後に締切のアイテムはありませんでした。"
-        send_discord(webhook_url, no_message)
+        if not any_sent:
+            no_message = ",".join(map(str, sorted(alert_days))) + "日後に締切のアイテムはありませんでした。"
+            post(no_message)
+    finally:
+        sender.shutdown(wait=True)
+        SESSION.close()
+    # 送信中に発生した例外をここで送出する
+    for future in pending:
+        future.result()
 
 
 if __name__ == "__main__":
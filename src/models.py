@@ -1,8 +1,8 @@
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DeadlineEntry:
     """締切のあるアイテムやイベントを表すデータモデル。
 
@@ -10,8 +10,16 @@ class DeadlineEntry:
         title (str): アイテムまたはイベントの名称。
         url (str): 詳細ページの URL。
         deadline (datetime): 締切日時。
+        deadline_date (date): 締切日。``deadline`` から生成時に一度だけ求める。
     """
 
     title: str
     url: str
     deadline: datetime
+    deadline_date: date = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """締切日時から締切日を求める。"""
+
+        # frozen なので通常の代入ではなく object.__setattr__ で設定する
+        object.__setattr__(self, "deadline_date", self.deadline.date())
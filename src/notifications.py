@@ -1,31 +1,30 @@
-from collections import defaultdict
 from datetime import datetime
-from typing import Sequence
+from itertools import groupby
+from operator import attrgetter
+import os
+from typing import Collection, Sequence
 
 from models import DeadlineEntry
 
 
 def filter_entries(
-    entries: Sequence[DeadlineEntry], alert_days: Sequence[int], now: datetime
+    entries: Sequence[DeadlineEntry], alert_days: Collection[int], now: datetime
 ) -> list[DeadlineEntry]:
     """通知対象の日数に該当するエントリを抽出する。
 
     Args:
         entries (Sequence[DeadlineEntry]): 全てのエントリ。
-        alert_days (Sequence[int]): 通知対象の日数リスト。
+        alert_days (Collection[int]): 通知対象の日数。集合を渡した場合はそのまま使う。
         now (datetime): 現在時刻。
 
     Returns:
         list[DeadlineEntry]: 条件に一致したエントリのリスト。
     """
 
-    alert_set = set(alert_days)
-    result: list[DeadlineEntry] = []
-    for entry in entries:
-        delta = (entry.deadline.date() - now.date()).days
-        if delta in alert_set:
-            result.append(entry)
-    return result
+    # 日付は生成時に求めた締切日の通日（toordinal）の整数で比較する
+    today = now.toordinal()
+    alert_set = alert_days if isinstance(alert_days, (set, frozenset)) else frozenset(alert_days)
+    return [entry for entry in entries if entry.deadline_date.toordinal() - today in alert_set]
 
 
 def format_message(
@@ -36,6 +35,9 @@ def format_message(
 ) -> str:
     """Discord 送信用のメッセージを整形する。
 
+    件数が ``max_display`` を超える場合はタイトルの先頭部分でまとめて省略する。
+    文字数では切り詰めず、Discord の上限を超える分は送信時に分割する。
+
     Args:
         section (str): メッセージの見出し。
         entries (Sequence[DeadlineEntry]): 表示するエントリ。
@@ -47,38 +49,51 @@ def format_message(
         str: 整形されたメッセージ。
     """
 
-    def merge_by_prefix(entries: list[DeadlineEntry], prefix_len: int) -> list[DeadlineEntry]:
+    def merge_by_prefix(
+        sorted_entries: Sequence[DeadlineEntry], prefix_len: int, limit: int | None = None
+    ) -> list[DeadlineEntry]:
         """タイトルの先頭部分でエントリをまとめる。
 
+        タイトル順に並んだエントリの隣接するものをまとめるため、結果はタイトル順になる。
+        まとめたエントリのタイトルはグループ内の共通接頭辞に "..." を付けたものとし、
+        URL と締切はグループ内でタイトルが最も小さいエントリのものを使う。
+
         Args:
-            entries (list[DeadlineEntry]): 対象エントリ。
+            sorted_entries (Sequence[DeadlineEntry]): タイトル順に並べた対象エントリ。
             prefix_len (int): 比較するタイトルの文字数。
+            limit (int | None, optional): 件数の上限。まとめた件数が上限を超えた時点で
+                打ち切り、``limit + 1`` 件を返す。デフォルトは ``None``（打ち切らない）。
 
         Returns:
             list[DeadlineEntry]: まとめた結果のエントリ。
         """
 
-        grouped = defaultdict(list)
-        for e in entries:
-            key = e.title[:prefix_len] if len(e.title) >= prefix_len else e.title
-            grouped[key].append(e)
+        def key(e: DeadlineEntry) -> str:
+            return e.title[:prefix_len]
+
         merged = []
-        for key, group in grouped.items():
+        # タイトル順に並んでいれば接頭辞順にも並んでいるので、ここでは並べ替えない
+        for _, g in groupby(sorted_entries, key=key):
+            group = list(g)
             if len(group) == 1:
                 merged.append(group[0])
             else:
                 merged.append(
                     DeadlineEntry(
-                        title=key + "...", url=group[0].url, deadline=group[0].deadline
+                        title=os.path.commonprefix([e.title for e in group]) + "...",
+                        url=group[0].url,
+                        deadline=group[0].deadline,
                     )
                 )
+            if limit is not None and len(merged) > limit:
+                break
         return merged
 
-    def build_lines(merged_items: list[DeadlineEntry], omitted: bool) -> list[str]:
+    def build_lines(merged_items: Sequence[DeadlineEntry], omitted: bool) -> list[str]:
         """メッセージの行リストを構築する。
 
         Args:
-            merged_items (list[DeadlineEntry]): 表示するエントリ。
+            merged_items (Sequence[DeadlineEntry]): 表示するエントリ。
             omitted (bool): 件数が省略されているかどうか。
 
         Returns:
@@ -87,7 +102,9 @@ def format_message(
 
         lines = [f"**{section}**"]
         if merged_items:
-            deadline_str = merged_items[0].deadline.strftime("%Y-%m-%d")
+            # strftime はロケール処理を挟むため、固定書式は f-string で組み立てる
+            d = merged_items[0].deadline_date
+            deadline_str = f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
             lines.append(f"締切: {deadline_str}")
             for e in merged_items:
                 lines.append(f"- [{e.title}]({e.url})")
@@ -95,32 +112,61 @@ def format_message(
             lines.append(omitted_message)
         return lines
 
-    min_display = 3
-    current_max = max_display
-    merged = entries[:]
-    omitted = False
-    while True:
-        merged = entries[:]
-        omitted = False
-        if len(merged) > current_max:
-            L = max(len(e.title) for e in merged)
-            for l in range(L, 0, -1):
-                merged = merge_by_prefix(merged, l)
-                if len(merged) <= current_max:
-                    break
-            if len(merged) > current_max:
-                merged = merged[:current_max]
-            omitted = True
-        lines = build_lines(merged, omitted)
-        msg = "\n".join(lines)
-        if len(msg) <= 2000 or current_max <= min_display:
-            break
-        current_max -= 2
-    while len(msg) > 2000 and len(merged) > min_display:
-        merged = merged[: len(merged) - 1]
-        omitted = True
-        lines = build_lines(merged, omitted)
-        msg = "\n".join(lines)
-    if len(msg) > 2000:
-        msg = f"**{section}**\n(省略されています)\n" + omitted_message
-    return msg
+    # よくある「件数が収まる」場合は、まとめの準備をせずに返す
+    if len(entries) <= max_display:
+        return "\n".join(build_lines(entries, False))
+
+    # まとめに使うエントリはタイトル順に一度だけ並べ、各接頭辞長で使い回す
+    by_title = sorted(entries, key=attrgetter("title"))
+
+    # 辞書順に並べたタイトルで、隣り合うもの同士の共通接頭辞の長さ（昇順）。
+    # タイトルの木の分岐の深さに相当し、まとめが必要になった時点で一度だけ求める
+    shared_lens: list[int] | None = None
+
+    def common_prefix_len(a: str, b: str) -> int:
+        """2 つのタイトルの共通接頭辞の長さを返す。同一のタイトルは常にまとまるため ``L`` とする。
+
+        Args:
+            a (str): タイトル。
+            b (str): タイトル。
+
+        Returns:
+            int: 共通接頭辞の長さ。
+        """
+
+        if a == b:
+            return L
+        n = min(len(a), len(b))
+        i = 0
+        while i < n and a[i] == b[i]:
+            i += 1
+        return i
+
+    def merge_to_fit(limit: int) -> list[DeadlineEntry]:
+        """件数が上限以下になる最長の接頭辞長でエントリをまとめる。
+
+        辞書順で隣り合うタイトルは、共通接頭辞が接頭辞長以上なら同じグループになるため、
+        接頭辞長 ``l`` でまとめた件数は「共通接頭辞長が ``l`` 未満の境目の数 + 1」になる。
+        件数を上限以下にするには境目を ``limit - 1`` 個以下に抑えればよく、最長の接頭辞長は
+        昇順に並べた共通接頭辞長の ``limit - 1`` 番目の値として探索なしで求まる。
+        どの長さでも上限を超える場合は 1 文字でまとめた結果を返す。
+
+        Args:
+            limit (int): 表示する最大件数。
+
+        Returns:
+            list[DeadlineEntry]: まとめた結果のエントリ。
+        """
+
+        nonlocal shared_lens
+        if shared_lens is None:
+            titles = [e.title for e in by_title]
+            shared_lens = sorted(common_prefix_len(a, b) for a, b in zip(titles, titles[1:]))
+        best = shared_lens[limit - 1] if limit - 1 < len(shared_lens) else L
+        return merge_by_prefix(by_title, max(best, 1), limit)
+
+    L = max((len(e.title) for e in entries), default=0)
+    # merge_to_fit は新しいリストを返すので、超過分はその場で切り詰める
+    merged = merge_to_fit(max_display)
+    del merged[max_display:]
+    return "\n".join(build_lines(merged, True))
@@ -15,13 +15,15 @@ def get_ticket_events() -> list[DeadlineEntry]:
     events = fetch_asobiticket()
     entries: list[DeadlineEntry] = []
     for event in events:
-        for start, end in event.uketsuke_kikan_list:
-            deadline = end.replace(hour=23, minute=59, second=0, microsecond=0)
-            entries.append(
-                DeadlineEntry(
-                    title=event.title if event.title else "(不明)",
-                    url=event.url,
-                    deadline=deadline,
-                )
+        # イベントごとに変わらない値は内側のループの外で求める
+        title = event.title or "(不明)"
+        url = event.url
+        entries.extend(
+            DeadlineEntry(
+                title=title,
+                url=url,
+                deadline=end.replace(hour=23, minute=59, second=0, microsecond=0),
             )
+            for _, end in event.uketsuke_kikan_list
+        )
     return entries